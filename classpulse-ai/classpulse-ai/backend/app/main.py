@@ -26,6 +26,7 @@ app.include_router(api_router, prefix=settings.API_V1_STR)
 from app.db.session import engine
 from app.models.base import Base
 from app.models import models  # Ensure models are imported for metadata generation
+from app.services.aggregation_scheduler import aggregation_scheduler
 
 @app.on_event("startup")
 async def startup_event():
@@ -33,3 +34,14 @@ async def startup_event():
     async with engine.begin() as conn:
         # For local MVP development, create all tables if they don't exist
         await conn.run_sync(Base.metadata.create_all)
+
+    # Alternative to the Celery beat task: aggregate on this process's event loop
+    if settings.AGGREGATION_MODE == "inprocess":
+        aggregation_scheduler.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    logger.info("Shutting down TeachPulse-AI API")
+    if settings.AGGREGATION_MODE == "inprocess":
+        await aggregation_scheduler.stop()
+    await engine.dispose()
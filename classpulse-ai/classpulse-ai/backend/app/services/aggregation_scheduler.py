@@ -0,0 +1,214 @@
+from app.core.config import settings
+from app.services.aggregation_service import aggregate_session_metrics
+from datetime import datetime, timedelta
+from typing import Optional
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Extends the lock only if we still own it, so a stale leader can't steal it back
+_RENEW_LEADER_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_RELEASE_LEADER_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+async def run_timed_aggregation(interval: float, window_start: datetime = None, window_end: datetime = None) -> str:
+    """
+    Runs one aggregation tick and logs its duration.
+    The window defaults to the interval that just ended.
+    Warns when the tick took longer than the scheduling interval.
+    """
+    if window_end is None:
+        window_end = datetime.utcnow()
+    if window_start is None:
+        window_start = window_end - timedelta(seconds=interval)
+
+    started = time.perf_counter()
+    result = await aggregate_session_metrics(window_start, window_end)
+    duration = time.perf_counter() - started
+
+    overrun = duration - interval
+    if result == "Failed":
+        logger.error(f"Aggregation tick failed after {duration:.3f}s")
+    elif overrun > 0:
+        logger.warning(f"Aggregation tick took {duration:.3f}s, overran the {interval:.1f}s interval by {overrun:.3f}s")
+    else:
+        logger.info(f"Aggregation tick took {duration:.3f}s ({result})")
+    return result
+
+
+class AggregationScheduler:
+    """
+    Runs aggregate_session_metrics every interval as a background task on the
+    API's event loop. Replicas elect a leader through a Redis lock so only one
+    of them aggregates at a time. The lock is renewed throughout each tick and
+    the tick is cancelled if it is lost; the task is restarted if it crashes.
+
+    Everything a tick awaits must be non-blocking (blocking calls go through
+    asyncio.to_thread), otherwise it stalls the API and the lease heartbeat.
+    """
+
+    def __init__(self, interval: Optional[float] = None, leader_key: Optional[str] = None, leader_ttl: Optional[float] = None):
+        self.interval = settings.AGGREGATION_INTERVAL_SECONDS if interval is None else interval
+        self.leader_key = settings.AGGREGATION_LEADER_KEY if leader_key is None else leader_key
+        self.leader_ttl = settings.AGGREGATION_LEADER_TTL_SECONDS if leader_ttl is None else leader_ttl
+        self.leader_ttl_ms = int(self.leader_ttl * 1000)
+        self.instance_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+        self._redis = None
+        self._task: Optional[asyncio.Task] = None
+        self._backoff = 1.0
+        # End of the last successfully aggregated window while we hold leadership
+        self._window_start: Optional[datetime] = None
+
+    def start(self):
+        if self._task is not None and not self._task.done():
+            return
+        import redis.asyncio as aioredis
+        self._redis = aioredis.from_url(settings.REDIS_URL, decode_responses=True)
+        self._task = asyncio.create_task(self._supervise(), name="aggregation-scheduler")
+        logger.info(f"Aggregation scheduler started as {self.instance_id} (every {self.interval:.1f}s)")
+
+    async def stop(self):
+        if self._task is None and self._redis is None:
+            return
+
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        if self._redis is not None:
+            try:
+                if self.is_leader:
+                    await self._redis.eval(_RELEASE_LEADER_SCRIPT, 1, self.leader_key, self.instance_id)
+            except Exception as e:
+                logger.error(f"Error releasing aggregation leadership: {e}")
+            await self._redis.aclose()
+            self._redis = None
+        self.is_leader = False
+        logger.info("Aggregation scheduler stopped")
+
+    async def _supervise(self):
+        while True:
+            try:
+                await self._run()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Aggregation scheduler crashed, restarting in {self._backoff:.0f}s: {e}")
+                self.is_leader = False
+                await asyncio.sleep(self._backoff)
+                self._backoff = min(self._backoff * 2, 60.0)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        while True:
+            if await self._acquire_or_renew_leadership():
+                await self._run_leader_tick()
+            else:
+                # Another replica owns the windows meanwhile; start fresh if we take over later
+                self._window_start = None
+            # A full iteration completed, so the next crash starts over from a short backoff
+            self._backoff = 1.0
+
+            # Fixed-rate schedule; after an overrun skip the missed ticks instead of bursting.
+            # No logs are lost: the next window starts where the last one ended.
+            next_tick += self.interval
+            now = loop.time()
+            if next_tick < now:
+                skipped = int((now - next_tick) // self.interval) + 1
+                next_tick += skipped * self.interval
+                logger.warning(f"Aggregation scheduler skipped {skipped} tick(s) after an overrun")
+            await asyncio.sleep(next_tick - now)
+
+    async def _run_leader_tick(self):
+        window_end = datetime.utcnow()
+        window_start = self._window_start
+        if window_start is None:
+            window_start = window_end - timedelta(seconds=self.interval)
+
+        tick = asyncio.create_task(run_timed_aggregation(self.interval, window_start, window_end))
+        heartbeat = asyncio.create_task(self._heartbeat(tick))
+        try:
+            await asyncio.wait({tick})
+        finally:
+            heartbeat.cancel()
+            # No-op once the tick is done; stops it if we are being cancelled ourselves
+            tick.cancel()
+
+        if tick.cancelled():
+            logger.warning("Aggregation tick aborted after losing leadership")
+            return None
+        result = tick.result()
+        # A failed window is retried as part of the next one
+        if result != "Failed":
+            self._window_start = window_end
+        return result
+
+    async def _heartbeat(self, tick: asyncio.Task):
+        # Keep the lease alive for ticks that run longer than the TTL
+        while True:
+            await asyncio.sleep(self.leader_ttl / 3)
+            if not await self._renew_leadership():
+                tick.cancel()
+                return
+
+    async def _renew_leadership(self) -> bool:
+        try:
+            renewed = await self._redis.eval(
+                _RENEW_LEADER_SCRIPT, 1, self.leader_key, self.instance_id, self.leader_ttl_ms
+            )
+        except Exception as e:
+            logger.error(f"Aggregation leadership renewal failed: {e}")
+            self.is_leader = False
+            return False
+
+        if renewed and not self.is_leader:
+            logger.info(f"Aggregation leadership reclaimed by {self.instance_id}")
+        elif not renewed and self.is_leader:
+            logger.warning(f"Aggregation leadership lost by {self.instance_id}")
+        self.is_leader = bool(renewed)
+        return self.is_leader
+
+    async def _acquire_or_renew_leadership(self) -> bool:
+        # The key may still hold our id after a failed renewal or a crash restart,
+        # in which case SET NX would fail against our own lock
+        if await self._renew_leadership():
+            return True
+
+        try:
+            acquired = await self._redis.set(
+                self.leader_key, self.instance_id, nx=True, px=self.leader_ttl_ms
+            )
+            if acquired:
+                logger.info(f"Aggregation leadership acquired by {self.instance_id}")
+                self.is_leader = True
+        except Exception as e:
+            # Without Redis we can't prove leadership, so stand down rather than double-aggregate
+            logger.error(f"Aggregation leader election failed: {e}")
+            self.is_leader = False
+
+        return self.is_leader
+
+
+aggregation_scheduler = AggregationScheduler()
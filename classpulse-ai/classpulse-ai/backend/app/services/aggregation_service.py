@@ -6,15 +6,19 @@ import logging
 
 logger = logging.getLogger(__name__)
 
-async def aggregate_session_metrics():
+async def aggregate_session_metrics(window_start: datetime = None, window_end: datetime = None):
     """
-    Queries emotion_logs for the last 10 seconds for all active sessions.
+    Queries emotion_logs in [window_start, window_end) for all active sessions,
+    defaulting to the last 10 seconds.
     Computes avg engagement, confusion, fatigue, dominant emotion.
     Stores result into DB.
     """
     try:
         async with async_session_maker() as db:
-            time_window = datetime.utcnow() - timedelta(seconds=10)
+            if window_end is None:
+                window_end = datetime.utcnow()
+            if window_start is None:
+                window_start = window_end - timedelta(seconds=10)
             
             # Subquery or group by session
             # Since emotion_log has participant_id, we need to join participants to get session_id
@@ -29,7 +33,7 @@ async def aggregate_session_metrics():
                     func.count().label("total_logs")
                 )
                 .join(Participant, EmotionLog.participant_id == Participant.id)
-                .where(EmotionLog.timestamp >= time_window)
+                .where(EmotionLog.timestamp >= window_start, EmotionLog.timestamp < window_end)
                 .group_by(Participant.session_id)
             )
             
@@ -1,4 +1,5 @@
 import os
+import asyncio
 import requests
 import logging
 from app.models.models import Insight
@@ -9,6 +10,7 @@ logger = logging.getLogger(__name__)
 HF_API_KEY = os.environ.get("HF_API_KEY", "")
 # Using Mistral 7B Instruct v0.2 endpoint
 API_URL = "https://api-inference.huggingface.co/models/mistralai/Mistral-7B-Instruct-v0.2"
+HF_TIMEOUT_SECONDS = 10.0
 
 async def generate_insight(session_id: int, avg_engagement: float, confusion_ratio: float, dominant_emotion: str, db_session):
     """
@@ -33,7 +35,14 @@ Dominant emotion: {dominant_emotion}
     
     try:
         if HF_API_KEY:
-            response = requests.post(API_URL, headers=headers, json={"inputs": prompt, "parameters": {"max_new_tokens": 50}})
+            # requests is blocking; run it in a thread so the event loop (and the API it may share) keeps serving
+            response = await asyncio.to_thread(
+                requests.post,
+                API_URL,
+                headers=headers,
+                json={"inputs": prompt, "parameters": {"max_new_tokens": 50}},
+                timeout=HF_TIMEOUT_SECONDS
+            )
             result = response.json()
             if isinstance(result, list) and len(result) > 0:
                 suggestion = result[0].get("generated_text", "").split("[/INST]")[-1].strip()
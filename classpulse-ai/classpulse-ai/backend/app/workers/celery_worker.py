@@ -1,8 +1,16 @@
 import os
+import asyncio
+import logging
 from celery import Celery
 from celery.schedules import crontab
+from celery.exceptions import WorkerTerminate
+from celery.signals import worker_init, worker_process_init, worker_process_shutdown, worker_shutdown
 from datetime import timedelta
-from app.services.aggregation_service import aggregate_session_metrics
+from app.core.config import settings
+from app.db.session import engine
+from app.services.aggregation_scheduler import run_timed_aggregation
+
+logger = logging.getLogger(__name__)
 
 celery_app = Celery(
     "teachpulse_worker",
@@ -13,23 +21,69 @@ celery_app = Celery(
 # Optional settings if using UTC
 celery_app.conf.timezone = 'UTC'
 
+# One event loop per worker process, kept for the process lifetime.
+# asyncpg connections are bound to the loop that opened them, so the engine's
+# pool is only safe to reuse across ticks if every tick runs on this same loop.
+# That holds only for pools running one task at a time per process (prefork/solo);
+# threads, gevent and eventlet would share the loop and the engine between tasks.
+_worker_loop = None
+_SUPPORTED_POOLS = ("prefork", "processes", "solo")
+
+@worker_init.connect
+def check_worker_pool(sender=None, **kwargs):
+    pool_cls = getattr(sender, "pool_cls", None)
+    if pool_cls is None:
+        return
+    # pool_cls is the -P name until Celery resolves it to the TaskPool class
+    pool = pool_cls if isinstance(pool_cls, str) else pool_cls.__module__.rsplit(".", 1)[-1]
+    if pool not in _SUPPORTED_POOLS:
+        logger.critical(f"Aggregation worker requires a prefork or solo pool, got '{pool}'")
+        # Signal receivers' exceptions are swallowed; WorkerTerminate is a SystemExit and stops startup
+        raise WorkerTerminate(1)
+
+def get_worker_loop():
+    global _worker_loop
+    if _worker_loop is not None and _worker_loop.is_running():
+        raise RuntimeError("Aggregation worker loop is already running; use a prefork or solo pool")
+    if _worker_loop is None or _worker_loop.is_closed():
+        _worker_loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_worker_loop)
+    return _worker_loop
+
+@worker_process_init.connect
+def init_worker_process(**kwargs):
+    # A forked child must not reuse the parent's pooled connections; drop them
+    # without closing so the parent's sockets are left untouched
+    engine.sync_engine.dispose(close=False)
+    get_worker_loop()
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def shutdown_worker_loop(**kwargs):
+    global _worker_loop
+    if _worker_loop is None or _worker_loop.is_closed():
+        return
+    try:
+        _worker_loop.run_until_complete(engine.dispose())
+    except Exception as e:
+        logger.error(f"Error disposing DB engine on worker shutdown: {e}")
+    finally:
+        _worker_loop.close()
+        _worker_loop = None
+
 @celery_app.on_after_configure.connect
 def setup_periodic_tasks(sender, **kwargs):
-    # Runs the aggregation task every 10 seconds per blueprint
-    sender.add_periodic_task(10.0, aggregate_metrics_task.s(), name='aggregate_metrics_every_10s')
+    # In "inprocess" mode the API process aggregates itself (see app.services.aggregation_scheduler)
+    if settings.AGGREGATION_MODE != "celery":
+        return
+    interval = settings.AGGREGATION_INTERVAL_SECONDS
+    # Runs the aggregation task every AGGREGATION_INTERVAL_SECONDS (10s per blueprint); a tick
+    # still queued after the next one is due is dropped rather than piling up behind it
+    sender.add_periodic_task(interval, aggregate_metrics_task.s(), name='aggregate_metrics', expires=interval)
 
 @celery_app.task
 def aggregate_metrics_task():
-    # Because Celery tasks are synchronous by design, we wrap the async DB call inside an asyncio event loop
-    import asyncio
-    
-    # We don't want to run asyncio.run() if the loop is already running, 
-    # but in a standard celery worker it won't be.
-    try:
-        loop = asyncio.get_event_loop()
-    except RuntimeError:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-    result = loop.run_until_complete(aggregate_session_metrics())
-    return result
+    # Celery tasks are synchronous, so run the async aggregation on the worker's persistent loop.
+    # Each tick aggregates the interval that just ended.
+    loop = get_worker_loop()
+    return loop.run_until_complete(run_timed_aggregation(settings.AGGREGATION_INTERVAL_SECONDS))